@@ -1,17 +1,29 @@
 # app.py - Main Flask Application (Complete Revised Version)
-from flask import Flask, render_template, request, jsonify, redirect, url_for
+from flask import Flask, render_template, stream_template, request, jsonify, redirect, url_for
+from markupsafe import Markup
 from flask_sqlalchemy import SQLAlchemy
-from datetime import datetime
+from sqlalchemy import event
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from datetime import datetime, timedelta, timezone
+import json
 import os
+import random
+import threading
 from werkzeug.utils import secure_filename
 
+from feed_snapshot import FeedSnapshot
+
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'your-secret-key-here'
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///campus_club.db'
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///campus_club.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['UPLOAD_FOLDER'] = 'static/uploads'
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
 
+# Emit UTF-8 JSON rather than \u escapes (about half the size for CJK text);
+# the feed snapshot and asgi.py encode the same way
+app.json.ensure_ascii = False
+
 db = SQLAlchemy(app)
 
 # Create upload directory if it doesn't exist
@@ -55,19 +67,333 @@ class Like(db.Model):
     post_id = db.Column(db.Integer, db.ForeignKey('post.id'), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+class AppliedOperation(db.Model):
+    # Client-supplied operation ids already applied through /api/batch, so replays are no-ops
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.String(100), nullable=False)
+    op_id = db.Column(db.String(100), nullable=False)
+    result = db.Column(db.Text, nullable=False)  # JSON-encoded per-op result
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+    __table_args__ = (db.UniqueConstraint('user_id', 'op_id'),)
+
+class FeedChange(db.Model):
+    # Bounded log of posts/clubs whose feed-visible fields changed, so every
+    # worker's feed snapshot can refresh incrementally
+    id = db.Column(db.Integer, primary_key=True)
+    post_id = db.Column(db.Integer)
+    club_id = db.Column(db.Integer)
+
+    # Never reuse ids after pruning; snapshots detect gaps by id
+    __table_args__ = {'sqlite_autoincrement': True}
+
+# Engagement rollups, maintained incrementally by the write helpers below so
+# analytics never scan the raw Like/Subscription history.
+# granularity is 'hour' or 'day'; bucket is the UTC start of that hour/day.
+class PostEngagementRollup(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    post_id = db.Column(db.Integer, db.ForeignKey('post.id'), nullable=False)
+    club_id = db.Column(db.Integer, db.ForeignKey('club.id'), nullable=False)
+    granularity = db.Column(db.String(10), nullable=False)
+    bucket = db.Column(db.DateTime, nullable=False)
+    likes = db.Column(db.Integer, default=0, nullable=False)
+    unlikes = db.Column(db.Integer, default=0, nullable=False)
+    views = db.Column(db.Integer, default=0, nullable=False)
+
+    __table_args__ = (
+        db.UniqueConstraint('post_id', 'granularity', 'bucket'),
+        db.Index('ix_post_rollup_club_bucket', 'club_id', 'granularity', 'bucket'),
+        db.Index('ix_post_rollup_bucket', 'granularity', 'bucket'),
+    )
+
+class ClubEngagementRollup(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    club_id = db.Column(db.Integer, db.ForeignKey('club.id'), nullable=False)
+    granularity = db.Column(db.String(10), nullable=False)
+    bucket = db.Column(db.DateTime, nullable=False)
+    likes = db.Column(db.Integer, default=0, nullable=False)
+    unlikes = db.Column(db.Integer, default=0, nullable=False)
+    views = db.Column(db.Integer, default=0, nullable=False)
+    new_subscribers = db.Column(db.Integer, default=0, nullable=False)
+    lost_subscribers = db.Column(db.Integer, default=0, nullable=False)
+
+    __table_args__ = (
+        db.UniqueConstraint('club_id', 'granularity', 'bucket'),
+        db.Index('ix_club_rollup_bucket', 'granularity', 'bucket'),
+    )
+
+ROLLUP_COUNTERS = ('likes', 'unlikes', 'views', 'new_subscribers', 'lost_subscribers')
+
+def rollup_buckets(moment):
+    return {
+        'hour': moment.replace(minute=0, second=0, microsecond=0),
+        'day': moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    }
+
+def _bump_rollup(model, key, counts, **columns):
+    # Single-statement upsert so concurrent writers never race on bucket creation
+    stmt = sqlite_insert(model).values(**key, **columns, **counts)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(key),
+        set_={name: getattr(model, name) + value for name, value in counts.items()}
+    )
+    db.session.execute(stmt)
+
+# Hourly buckets older than this are dropped by compact_rollups; daily ones are kept
+ROLLUP_HOURLY_RETENTION = timedelta(days=30)
+
+_last_compacted_hour = None
+
+def compact_rollups(now=None):
+    cutoff = rollup_buckets((now or datetime.utcnow()) - ROLLUP_HOURLY_RETENTION)['hour']
+    for model in (PostEngagementRollup, ClubEngagementRollup):
+        model.query.filter(model.granularity == 'hour', model.bucket < cutoff).delete(synchronize_session=False)
+
+@app.cli.command('compact-rollups')
+def compact_rollups_command():
+    """Drop hourly engagement rollups past ROLLUP_HOURLY_RETENTION."""
+    compact_rollups()
+    db.session.commit()
+
+def record_engagement(club_id, post_id=None, **counts):
+    global _last_compacted_hour
+    buckets = rollup_buckets(datetime.utcnow())
+    
+    # Compact once per hour per process, inside the writer's transaction
+    if buckets['hour'] != _last_compacted_hour:
+        _last_compacted_hour = buckets['hour']
+        compact_rollups()
+    
+    for granularity, bucket in buckets.items():
+        if post_id is not None:
+            _bump_rollup(PostEngagementRollup,
+                         {'post_id': post_id, 'granularity': granularity, 'bucket': bucket},
+                         counts, club_id=club_id)
+        _bump_rollup(ClubEngagementRollup,
+                     {'club_id': club_id, 'granularity': granularity, 'bucket': bucket},
+                     counts)
+
+# Write helpers shared by the single-action and batch endpoints.
+# They only stage changes; the caller owns the commit. Passing None toggles,
+# and the resulting state is returned, so a toggle costs one lookup.
+def set_like(user_id, post, liked=None):
+    existing_like = Like.query.filter_by(user_id=user_id, post_id=post.id).first()
+    if liked is None:
+        liked = existing_like is None
+    
+    if existing_like and not liked:
+        db.session.delete(existing_like)
+        post.likes -= 1
+        record_engagement(post.club_id, post.id, unlikes=1)
+    elif not existing_like and liked:
+        db.session.add(Like(user_id=user_id, post_id=post.id))
+        post.likes += 1
+        record_engagement(post.club_id, post.id, likes=1)
+    return liked
+
+def set_subscription(user_id, club, subscribed=None):
+    existing_sub = Subscription.query.filter_by(user_id=user_id, club_id=club.id).first()
+    if subscribed is None:
+        subscribed = existing_sub is None
+    
+    if existing_sub and not subscribed:
+        db.session.delete(existing_sub)
+        club.subscribers -= 1
+        record_engagement(club.id, lost_subscribers=1)
+    elif not existing_sub and subscribed:
+        db.session.add(Subscription(user_id=user_id, club_id=club.id))
+        club.subscribers += 1
+        record_engagement(club.id, new_subscribers=1)
+    return subscribed
+
+def record_view(post):
+    post.views += 1
+    record_engagement(post.club_id, post.id, views=1)
+
+SQLITE_INTEGER_MIN, SQLITE_INTEGER_MAX = -2 ** 63, 2 ** 63 - 1
+
+def _op_int(op, key):
+    # Ids must fit SQLite's 64-bit INTEGER; larger ints make the driver raise
+    value = op.get(key)
+    if isinstance(value, int) and not isinstance(value, bool) and SQLITE_INTEGER_MIN <= value <= SQLITE_INTEGER_MAX:
+        return value
+    return None
+
+def apply_operation(user_id, op):
+    op_type = op.get('type')
+    
+    if op_type in ('like', 'unlike', 'view'):
+        post_id = _op_int(op, 'post_id')
+        if post_id is None:
+            return {'success': False, 'error': 'post_id must be an integer'}
+        
+        post = db.session.get(Post, post_id)
+        if post is None:
+            return {'success': False, 'error': 'Post not found'}
+        
+        if op_type == 'view':
+            record_view(post)
+            return {'success': True, 'post_id': post.id, 'views': post.views}
+        
+        set_like(user_id, post, op_type == 'like')
+        return {'success': True, 'post_id': post.id, 'liked': op_type == 'like', 'likes': post.likes}
+    
+    if op_type in ('subscribe', 'unsubscribe'):
+        club_id = _op_int(op, 'club_id')
+        if club_id is None:
+            return {'success': False, 'error': 'club_id must be an integer'}
+        
+        club = db.session.get(Club, club_id)
+        if club is None:
+            return {'success': False, 'error': 'Club not found'}
+        
+        set_subscription(user_id, club, op_type == 'subscribe')
+        return {'success': True, 'club_id': club.id, 'subscribed': op_type == 'subscribe',
+                'subscribers': club.subscribers}
+    
+    return {'success': False, 'error': f'Unknown operation type: {op_type}'}
+
+# Feed rendering
+FEED_PER_PAGE = 10
+CARD_CACHE_SIZE = 1000
+
+# post id -> (signature of the rendered fields, card HTML); shared by the
+# threads of one worker (asgi.py runs views on a thread pool)
+_card_cache = {}
+_card_cache_lock = threading.Lock()
+
+def feed_page(page):
+    # Eager-load clubs in the same query; every card reads post.club, so lazy loading is N+1
+    return Post.query.options(db.joinedload(Post.club)).order_by(Post.created_at.desc(), Post.id.desc()).paginate(
+        page=page, per_page=FEED_PER_PAGE, error_out=False
+    )
+
+@app.template_global()
+def render_post_card(post):
+    # The card is rendered in its neutral state (not liked, not following);
+    # per-user state is applied client-side, so one fragment serves everyone.
+    signature = (post.title, post.content, post.media_url, post.likes,
+                 post.event_type, post.event_date, post.club_id, post.club.name, post.club.username)
+    with _card_cache_lock:
+        cached = _card_cache.get(post.id)
+    if cached and cached[0] == signature:
+        return cached[1]
+    
+    # Render outside the lock; two threads racing on one post just both render it.
+    # Placeholder counters are seeded by post id so a re-render does not re-roll them.
+    placeholder = random.Random(post.id)
+    html = Markup(render_template(
+        '_post_card.html', post=post,
+        comment_count=placeholder.randint(0, 99), share_count=placeholder.randint(0, 49)
+    ))
+    
+    with _card_cache_lock:
+        _card_cache.pop(post.id, None)
+        if len(_card_cache) >= CARD_CACHE_SIZE:
+            _card_cache.pop(next(iter(_card_cache)))  # Evict the oldest entry
+        _card_cache[post.id] = (signature, html)
+    return html
+
+# Feed snapshot: /api/feed is served from pre-encoded records (see feed_snapshot.py)
+FEED_SNAPSHOT_MAX_POSTS = 10000
+FEED_SNAPSHOT_MAX_BYTES = 32 * 1024 * 1024  # Per worker; posts past the budget are served from the DB
+FEED_CHANGE_RETENTION = 10000
+
+feed_snapshot = FeedSnapshot(FEED_SNAPSHOT_MAX_POSTS, FEED_SNAPSHOT_MAX_BYTES)
+_feed_snapshot_lock = threading.Lock()
+
+@event.listens_for(db.session, 'after_flush')
+def log_feed_changes(session, flush_context):
+    changes = []
+    for obj in list(session.new) + list(session.dirty):
+        if isinstance(obj, Post) and session.is_modified(obj):
+            changes.append({'post_id': obj.id, 'club_id': None})
+        elif isinstance(obj, Club) and session.is_modified(obj):
+            changes.append({'post_id': None, 'club_id': obj.id})
+    
+    if changes:
+        connection = session.connection()
+        connection.execute(FeedChange.__table__.insert(), changes)
+        connection.execute(db.text(
+            'DELETE FROM feed_change WHERE id <= (SELECT MAX(id) FROM feed_change) - :retention'
+        ), {'retention': FEED_CHANGE_RETENTION})
+
+def _feed_post_rows(*criteria, limit=None):
+    # Plain column rows: no ORM instances, identity map or attribute instrumentation
+    query = db.select(
+        Post.id, Post.club_id, Post.title, Post.content, Post.media_url, Post.media_type,
+        Post.likes, Post.views, Post.created_at, Post.event_type, Post.event_date
+    ).where(*criteria).order_by(Post.created_at.desc(), Post.id.desc()).limit(limit)
+    return db.session.execute(query)
+
+def _load_feed_clubs(*criteria):
+    query = db.select(Club.id, Club.name, Club.username, Club.avatar, Club.subscribers).where(*criteria)
+    for row in db.session.execute(query):
+        feed_snapshot.upsert_club(*row)
+
+def refresh_feed_snapshot():
+    # Caller holds _feed_snapshot_lock
+    changes = db.session.execute(
+        db.select(FeedChange.id, FeedChange.post_id, FeedChange.club_id)
+        .where(FeedChange.id > feed_snapshot.watermark).order_by(FeedChange.id)
+    ).all()
+    
+    # Pruned past our watermark (or first use): rebuild from scratch
+    if not feed_snapshot.loaded or (changes and changes[0].id != feed_snapshot.watermark + 1):
+        feed_snapshot.clear()
+        feed_snapshot.watermark = db.session.execute(db.select(db.func.max(FeedChange.id))).scalar() or 0
+        _load_feed_clubs()
+        rows = _feed_post_rows(limit=FEED_SNAPSHOT_MAX_POSTS)
+        for row in rows:
+            feed_snapshot.upsert_post(*row)
+            if feed_snapshot.truncated:
+                break  # Byte budget reached; every older row would be evicted too
+        rows.close()
+        feed_snapshot.total = db.session.execute(db.select(db.func.count(Post.id))).scalar()
+        if len(feed_snapshot.records) < feed_snapshot.total:
+            feed_snapshot.truncated = True
+        feed_snapshot.loaded = True
+        return
+    
+    if not changes:
+        return
+    
+    post_ids = {change.post_id for change in changes if change.post_id is not None}
+    club_ids = {change.club_id for change in changes if change.club_id is not None}
+    
+    if club_ids:
+        _load_feed_clubs(Club.id.in_(club_ids))
+    if post_ids:
+        if not post_ids <= feed_snapshot.records.keys():
+            feed_snapshot.total = db.session.execute(db.select(db.func.count(Post.id))).scalar()
+        for row in _feed_post_rows(Post.id.in_(post_ids)):
+            if row.club_id not in feed_snapshot.clubs:
+                _load_feed_clubs(Club.id == row.club_id)
+            feed_snapshot.upsert_post(*row)
+    
+    feed_snapshot.watermark = changes[-1].id
+
+def feed_snapshot_page(page):
+    with _feed_snapshot_lock:
+        refresh_feed_snapshot()
+        return feed_snapshot.page(page, FEED_PER_PAGE)
+
 # Routes
 @app.route('/')
 def index():
-    return render_template('index.html')
+    # Stream the page so the first feed page is painted without an extra round trip
+    return stream_template('index.html', feed=feed_page(1))
 
 @app.route('/api/feed')
 def get_feed():
     page = request.args.get('page', 1, type=int)
-    per_page = 10
     
-    posts = Post.query.order_by(Post.created_at.desc()).paginate(
-        page=page, per_page=per_page, error_out=False
-    )
+    body = feed_snapshot_page(page)
+    if body is not None:
+        return app.response_class(body, mimetype='application/json')
+    
+    # Pages beyond the snapshot window are served from the database
+    posts = feed_page(page)
     
     feed_data = []
     for post in posts.items:
@@ -97,6 +423,17 @@ def get_feed():
         'total': posts.total
     })
 
+@app.route('/api/feed/fragment')
+def get_feed_fragment():
+    page = request.args.get('page', 1, type=int)
+    posts = feed_page(page)
+    
+    html = ''.join(render_post_card(post) for post in posts.items)
+    return html, 200, {
+        'Content-Type': 'text/html; charset=utf-8',
+        'X-Has-Next': 'true' if posts.has_next else 'false'
+    }
+
 @app.route('/api/post', methods=['POST'])
 def create_post():
     data = request.get_json()
@@ -148,17 +485,7 @@ def toggle_like(post_id):
     user_id = request.get_json().get('user_id', 'demo_user')  # In production, get from auth
     
     post = Post.query.get_or_404(post_id)
-    existing_like = Like.query.filter_by(user_id=user_id, post_id=post_id).first()
-    
-    if existing_like:
-        db.session.delete(existing_like)
-        post.likes -= 1
-        liked = False
-    else:
-        new_like = Like(user_id=user_id, post_id=post_id)
-        db.session.add(new_like)
-        post.likes += 1
-        liked = True
+    liked = set_like(user_id, post)
     
     db.session.commit()
     
@@ -173,17 +500,7 @@ def toggle_subscribe(club_id):
     user_id = request.get_json().get('user_id', 'demo_user')  # In production, get from auth
     
     club = Club.query.get_or_404(club_id)
-    existing_sub = Subscription.query.filter_by(user_id=user_id, club_id=club_id).first()
-    
-    if existing_sub:
-        db.session.delete(existing_sub)
-        club.subscribers -= 1
-        subscribed = False
-    else:
-        new_sub = Subscription(user_id=user_id, club_id=club_id)
-        db.session.add(new_sub)
-        club.subscribers += 1
-        subscribed = True
+    subscribed = set_subscription(user_id, club)
     
     db.session.commit()
     
@@ -193,6 +510,128 @@ def toggle_subscribe(club_id):
         'subscribers': club.subscribers
     })
 
+MAX_BATCH_OPERATIONS = 100
+APPLIED_OPERATION_RETENTION = timedelta(days=7)  # How long a client may replay an op_id
+
+@app.route('/api/batch', methods=['POST'])
+def apply_batch():
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Expected a JSON object'}), 400
+    user_id = data.get('user_id', 'demo_user')  # In production, get from auth
+    operations = data.get('operations')
+    
+    if not isinstance(user_id, str):
+        return jsonify({'error': 'user_id must be a string'}), 400
+    if not isinstance(operations, list) or len(operations) > MAX_BATCH_OPERATIONS:
+        return jsonify({'error': f'operations must be a list of at most {MAX_BATCH_OPERATIONS}'}), 400
+    if any(not isinstance(op, dict) or not isinstance(op.get('op_id'), str)
+           or not 0 < len(op['op_id']) <= 100 for op in operations):
+        return jsonify({'error': 'Every operation needs a string op_id of at most 100 characters'}), 400
+    
+    # Apply in order inside one transaction; replayed op_ids return their original result
+    results = []
+    for op in operations:
+        op_id = op['op_id']
+        
+        # Claim the op_id before applying it. A concurrent retry waits on SQLite's write
+        # lock here, then sees the committed claim and takes the replay branch.
+        claim = sqlite_insert(AppliedOperation).values(
+            user_id=user_id, op_id=op_id, result='{}', created_at=datetime.utcnow()
+        ).on_conflict_do_nothing(index_elements=['user_id', 'op_id'])
+        
+        if db.session.execute(claim).rowcount:
+            result = apply_operation(user_id, op)
+            AppliedOperation.query.filter_by(user_id=user_id, op_id=op_id).update(
+                {'result': json.dumps(result)}, synchronize_session=False
+            )
+        else:
+            result = json.loads(db.session.execute(
+                db.select(AppliedOperation.result).filter_by(user_id=user_id, op_id=op_id)
+            ).scalar_one())
+            result['replayed'] = True
+        
+        results.append({'op_id': op_id, **result})
+    
+    AppliedOperation.query.filter(
+        AppliedOperation.created_at < datetime.utcnow() - APPLIED_OPERATION_RETENTION
+    ).delete(synchronize_session=False)
+    
+    db.session.commit()
+    
+    return jsonify({
+        'success': True,
+        'results': results
+    })
+
+def _parse_utc(value):
+    moment = datetime.fromisoformat(value)
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment
+
+@app.route('/api/clubs/<int:club_id>/stats')
+def get_club_stats(club_id):
+    club = Club.query.get_or_404(club_id)
+    
+    # Accepts ISO dates/times; naive values are UTC, aware ones are converted to UTC.
+    # Defaults to the last 7 days.
+    try:
+        end = _parse_utc(request.args['end']) if request.args.get('end') else datetime.utcnow()
+        start = _parse_utc(request.args['start']) if request.args.get('start') else end - timedelta(days=7)
+    except ValueError:
+        return jsonify({'error': 'start and end must be ISO dates'}), 400
+    if start > end:
+        return jsonify({'error': 'start must not be after end'}), 400
+    
+    hourly_cutoff = datetime.utcnow() - ROLLUP_HOURLY_RETENTION
+    granularity = request.args.get('granularity') or (
+        'hour' if end - start <= timedelta(days=2) and start >= hourly_cutoff else 'day'
+    )
+    if granularity not in ('hour', 'day'):
+        return jsonify({'error': "granularity must be 'hour' or 'day'"}), 400
+    if granularity == 'hour' and start < hourly_cutoff:
+        return jsonify({'error': f'hourly stats are kept for {ROLLUP_HOURLY_RETENTION.days} days'}), 400
+    
+    # Include the bucket that contains start
+    first_bucket = rollup_buckets(start)[granularity]
+    
+    club_rows = ClubEngagementRollup.query.filter(
+        ClubEngagementRollup.club_id == club.id,
+        ClubEngagementRollup.granularity == granularity,
+        ClubEngagementRollup.bucket >= first_bucket,
+        ClubEngagementRollup.bucket < end
+    ).order_by(ClubEngagementRollup.bucket).all()
+    
+    post_counters = ('likes', 'unlikes', 'views')
+    post_rows = db.session.query(
+        PostEngagementRollup.post_id,
+        *(db.func.sum(getattr(PostEngagementRollup, name)) for name in post_counters)
+    ).filter(
+        PostEngagementRollup.club_id == club.id,
+        PostEngagementRollup.granularity == granularity,
+        PostEngagementRollup.bucket >= first_bucket,
+        PostEngagementRollup.bucket < end
+    ).group_by(PostEngagementRollup.post_id).all()
+    
+    series = [{
+        'bucket': row.bucket.strftime('%Y-%m-%d %H:%M'),
+        **{name: getattr(row, name) for name in ROLLUP_COUNTERS}
+    } for row in club_rows]
+    
+    return jsonify({
+        'club_id': club.id,
+        'granularity': granularity,
+        'start': start.strftime('%Y-%m-%d %H:%M'),
+        'end': end.strftime('%Y-%m-%d %H:%M'),
+        'totals': {name: sum(point[name] for point in series) for name in ROLLUP_COUNTERS},
+        'series': series,
+        'posts': [{
+            'post_id': row[0],
+            **dict(zip(post_counters, row[1:]))
+        } for row in post_rows]
+    })
+
 @app.route('/api/clubs')
 def get_clubs():
     clubs = Club.query.all()
@@ -0,0 +1,211 @@
+# asgi.py - ASGI entry point for I/O-bound serving
+#
+# Run with:  uvicorn asgi:application --workers 2
+#
+# The read endpoints are answered without the Flask request cycle: /api/clubs
+# through aiosqlite on the event loop, /api/feed from the same pre-encoded
+# snapshot the WSGI app serves (pages past the snapshot window fall through to
+# the Flask view). A slow client reading a response costs a coroutine instead
+# of a whole worker. Every other route falls through to the Flask app. Request bodies (uploads) are received on the event loop, capped at
+# MAX_CONTENT_LENGTH and spooled to a temporary file from a worker thread, then
+# the Flask view runs in a thread pool, so a client trickling an upload never
+# holds a thread either.
+import asyncio
+from tempfile import SpooledTemporaryFile
+
+import aiosqlite
+from asgiref.sync import AsyncToSync, sync_to_async
+from asgiref.wsgi import WsgiToAsgiInstance
+
+from app import app, db, init_database, feed_snapshot_page
+
+# Initialize database on startup
+init_database()
+
+with app.app_context():
+    DATABASE_PATH = db.engine.url.database
+
+_connection = None
+_connection_lock = asyncio.Lock()  # Lifespan may be off; first requests race to connect
+
+
+class _PooledWsgiInstance(WsgiToAsgiInstance):
+    async def __call__(self, scope, receive, send):
+        self.scope = scope
+        limit = app.config['MAX_CONTENT_LENGTH']
+
+        # Reject a declared oversized body before reading any of it, as Werkzeug does
+        for name, value in scope.get('headers', []):
+            if name == b'content-length' and value.isdigit() and int(value) > limit:
+                await _send_too_large(send)
+                return
+
+        with SpooledTemporaryFile(max_size=65536) as body:
+            received = 0
+            while True:
+                message = await receive()
+                if message['type'] == 'http.disconnect':
+                    return
+                chunk = message.get('body', b'')
+                received += len(chunk)
+                if received > limit:
+                    # Chunked or lying uploads: stop reading at the cap
+                    await _send_too_large(send)
+                    return
+                if chunk:
+                    # Past 64 KB the spool is on disk; keep those writes off the loop
+                    await asyncio.to_thread(body.write, chunk)
+                if not message.get('more_body'):
+                    break
+            body.seek(0)
+
+            self.sync_send = AsyncToSync(send)
+            await self.run_wsgi_app(body)
+
+    # asgiref runs WSGI apps on a single shared thread by default; Flask views
+    # are thread-safe, so let concurrent requests use the executor pool.
+    @sync_to_async(thread_sensitive=False)
+    def run_wsgi_app(self, body):
+        try:
+            environ = self.build_environ(self.scope, body)
+        except ValueError:
+            # Too many duplicate headers
+            self.sync_send({'type': 'http.response.start', 'status': 400,
+                            'headers': [(b'content-type', b'text/plain')]})
+            self.sync_send({'type': 'http.response.body', 'body': b'Bad Request'})
+            return
+        output = self.wsgi_application(environ, self.start_response)
+        try:
+            for chunk in output:
+                if not self.response_started:
+                    self.response_started = True
+                    self.sync_send(self.response_start)
+                self.sync_send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        finally:
+            # Lets streamed responses (stream_with_context) tear down their context
+            if hasattr(output, 'close'):
+                output.close()
+
+        if not self.response_started:
+            self.response_started = True
+            self.sync_send(self.response_start)
+        self.sync_send({'type': 'http.response.body'})
+
+
+async def _send_too_large(send):
+    body = b'Request Entity Too Large'
+    await send({
+        'type': 'http.response.start',
+        'status': 413,
+        'headers': [
+            (b'content-type', b'text/plain'),
+            (b'content-length', str(len(body)).encode('ascii')),
+            (b'connection', b'close'),
+        ],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def _get_connection():
+    global _connection
+    if _connection is None:
+        async with _connection_lock:
+            if _connection is None:
+                _connection = await aiosqlite.connect(DATABASE_PATH)
+    return _connection
+
+
+async def _send_json(send, payload, status=200):
+    # Byte-for-byte what jsonify produces: same provider settings and trailing newline
+    body = (app.json.dumps(payload, separators=(',', ':')) + '\n').encode('utf-8')
+    await _send_body(send, body, status)
+
+
+async def _send_body(send, body, status=200):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(body)).encode('ascii')),
+        ],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+def _query_int(scope, name, default):
+    for pair in scope.get('query_string', b'').decode('latin-1').split('&'):
+        key, _, value = pair.partition('=')
+        if key == name:
+            try:
+                return int(value)
+            except ValueError:
+                return default
+    return default
+
+
+@sync_to_async(thread_sensitive=False)
+def _feed_snapshot_body(page):
+    # The refresh reads the change log through the ORM, so it runs in the pool
+    with app.app_context():
+        return feed_snapshot_page(page)
+
+
+async def get_feed(scope, receive, send):
+    # Same snapshot bytes as app.get_feed; no third serializer of the payload here
+    body = await _feed_snapshot_body(_query_int(scope, 'page', 1))
+    if body is None:
+        # Past the snapshot window: let the Flask view run its database fallback
+        await _PooledWsgiInstance(app)(scope, receive, send)
+        return
+    await _send_body(send, body)
+
+
+async def get_clubs(scope, receive, send):
+    conn = await _get_connection()
+    async with conn.execute(
+        'SELECT id, name, username, bio, avatar, subscribers FROM club'
+    ) as cursor:
+        rows = await cursor.fetchall()
+
+    await _send_json(send, [{
+        'id': row[0],
+        'name': row[1],
+        'username': row[2],
+        'bio': row[3],
+        'avatar': row[4],
+        'subscribers': row[5]
+    } for row in rows])
+
+
+ASYNC_ROUTES = {
+    '/api/feed': get_feed,
+    '/api/clubs': get_clubs,
+}
+
+
+async def _lifespan(receive, send):
+    global _connection
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await _get_connection()
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            if _connection is not None:
+                await _connection.close()
+                _connection = None
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        await _lifespan(receive, send)
+        return
+
+    handler = ASYNC_ROUTES.get(scope['path']) if scope.get('method') == 'GET' else None
+    if handler is not None:
+        await handler(scope, receive, send)
+    else:
+        await _PooledWsgiInstance(app)(scope, receive, send)
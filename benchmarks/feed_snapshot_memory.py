@@ -0,0 +1,72 @@
+# benchmarks/feed_snapshot_memory.py - Memory and page-assembly cost of the feed snapshot
+#
+# Run from the repository root:  python benchmarks/feed_snapshot_memory.py
+#
+# Fills a FeedSnapshot with synthetic posts shaped like the sample data
+# (content length, clubs, dates) and reports traced memory per post, how close
+# the snapshot's own byte accounting is to it, and the time to assemble a feed
+# page. No database or Flask app is needed.
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from feed_snapshot import FeedSnapshot  # noqa: E402
+
+CLUBS = 50
+PER_PAGE = 10
+
+
+def build(posts, content_chars, max_bytes):
+    snapshot = FeedSnapshot(max_posts=posts, max_bytes=max_bytes)
+    for club_id in range(1, CLUBS + 1):
+        snapshot.upsert_club(club_id, f'社團 {club_id}', f'@club_{club_id}', '/static/default-avatar.png', 1000)
+
+    start = datetime(2025, 9, 1)
+    text = '政大校園活動，歡迎參加！' * (content_chars // 12 + 1)
+    for post_id in range(1, posts + 1):
+        snapshot.upsert_post(
+            post_id, random.randint(1, CLUBS), f'活動 {post_id}', text[:content_chars],
+            f'/static/uploads/{post_id}.png', 'image', random.randint(0, 500), random.randint(0, 3000),
+            start + timedelta(minutes=post_id), 'workshop', start + timedelta(days=30)
+        )
+    snapshot.total = posts
+    snapshot.loaded = True
+    return snapshot
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--posts', type=int, default=100_000)
+    parser.add_argument('--content-chars', type=int, default=600,
+                        help='post body length in characters (sample posts average ~600)')
+    parser.add_argument('--max-bytes', type=int, default=1 << 40,
+                        help='snapshot byte budget (default: effectively unbounded)')
+    args = parser.parse_args()
+
+    random.seed(0)
+    tracemalloc.start()
+    snapshot = build(args.posts, args.content_chars, args.max_bytes)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    kept = len(snapshot.records)
+    pages = max(kept // PER_PAGE, 1)
+    started = time.perf_counter()
+    for page in range(1, 1001):
+        snapshot.page(random.randint(1, pages), PER_PAGE)
+    page_us = (time.perf_counter() - started) / 1000 * 1e6
+
+    print(f'posts:            {args.posts} ({kept} kept)')
+    print(f'snapshot memory:  {current / 1024 / 1024:.1f} MB ({current / max(kept, 1):.0f} bytes/post)')
+    print(f'accounted bytes:  {snapshot.bytes / 1024 / 1024:.1f} MB ({snapshot.bytes / max(current, 1):.0%} of traced)')
+    print(f'page assembly:    {page_us:.1f} us/page')
+
+
+if __name__ == '__main__':
+    main()
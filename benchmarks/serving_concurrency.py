@@ -0,0 +1,179 @@
+# benchmarks/serving_concurrency.py - Sync gunicorn vs ASGI under slow clients
+#
+# Run from the repository root:  python benchmarks/serving_concurrency.py
+#
+# For each deployment mode the script starts the server, opens N "slow"
+# uploads (headers plus a trickle of body, then stalled), and while they are
+# in flight fires concurrent GET /api/feed probes. It reports how many probes
+# were answered and how much resident memory each in-flight request cost.
+# Linux only (memory is read from /proc).
+import argparse
+import asyncio
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+UPLOAD_SIZE = 1024 * 1024
+BOUNDARY = 'benchboundary'
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _children(pid):
+    children = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                # The ppid is the second field after the parenthesised command name
+                ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        if ppid == pid:
+            children.append(int(entry))
+    return children
+
+
+def _tree_rss_kb(pid):
+    total = 0
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        try:
+            with open(f'/proc/{current}/status') as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        total += int(line.split()[1])
+        except OSError:
+            continue
+        pending.extend(_children(current))
+    return total
+
+
+def _start_server(mode, port, workers):
+    bind = f'127.0.0.1:{port}'
+    if mode == 'gunicorn-sync':
+        cmd = [sys.executable, '-m', 'gunicorn', '-w', str(workers), '-b', bind, 'wsgi:app']
+    else:
+        cmd = [sys.executable, '-m', 'uvicorn', 'asgi:application', '--workers', str(workers),
+               '--host', '127.0.0.1', '--port', str(port), '--log-level', 'warning']
+    return subprocess.Popen(cmd, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                            start_new_session=True)
+
+
+async def _get(port, path, timeout):
+    started = time.perf_counter()
+    try:
+        reader, writer = await asyncio.wait_for(asyncio.open_connection('127.0.0.1', port), timeout)
+        writer.write(f'GET {path} HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n'.encode())
+        await writer.drain()
+        status = await asyncio.wait_for(reader.readline(), timeout)
+        await asyncio.wait_for(reader.read(), timeout)
+        writer.close()
+    except (OSError, asyncio.TimeoutError):
+        return None
+    if b' 200 ' not in status:
+        return None
+    return time.perf_counter() - started
+
+
+async def _wait_ready(port, deadline=30.0):
+    end = time.monotonic() + deadline
+    while time.monotonic() < end:
+        if await _get(port, '/api/clubs', 1.0) is not None:
+            return
+        await asyncio.sleep(0.2)
+    raise RuntimeError(f'server on port {port} did not become ready')
+
+
+async def _open_slow_upload(port):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    preamble = (f'--{BOUNDARY}\r\n'
+                'Content-Disposition: form-data; name="file"; filename="bench.png"\r\n'
+                'Content-Type: image/png\r\n\r\n').encode()
+    headers = (f'POST /api/upload HTTP/1.1\r\nHost: localhost\r\n'
+               f'Content-Type: multipart/form-data; boundary={BOUNDARY}\r\n'
+               f'Content-Length: {len(preamble) + UPLOAD_SIZE}\r\n\r\n').encode()
+    # Send the headers and the first part of the body, then stall
+    writer.write(headers + preamble + b'\0' * 1024)
+    await writer.drain()
+    return writer
+
+
+async def run_mode(mode, workers, in_flight, probes, probe_timeout):
+    port = _free_port()
+    server = _start_server(mode, port, workers)
+    try:
+        await _wait_ready(port)
+        idle_rss = _tree_rss_kb(server.pid)
+
+        uploads = []
+        for _ in range(in_flight):
+            try:
+                uploads.append(await _open_slow_upload(port))
+            except OSError:
+                break
+        await asyncio.sleep(1.0)
+        loaded_rss = _tree_rss_kb(server.pid)
+
+        latencies = await asyncio.gather(
+            *(_get(port, '/api/feed', probe_timeout) for _ in range(probes))
+        )
+        answered = [latency for latency in latencies if latency is not None]
+
+        for writer in uploads:
+            writer.close()
+        await asyncio.gather(*(writer.wait_closed() for writer in uploads), return_exceptions=True)
+    finally:
+        os.killpg(server.pid, signal.SIGTERM)
+        try:
+            server.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            os.killpg(server.pid, signal.SIGKILL)
+            server.wait()
+
+    return {
+        'mode': mode,
+        'in_flight': len(uploads),
+        'answered': len(answered),
+        'p50_ms': sorted(answered)[len(answered) // 2] * 1000 if answered else None,
+        'idle_rss_mb': idle_rss / 1024,
+        'loaded_rss_mb': loaded_rss / 1024,
+        'kb_per_request': (loaded_rss - idle_rss) / max(len(uploads), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--in-flight', type=int, default=200,
+                        help='number of stalled uploads held open during the probe')
+    parser.add_argument('--probes', type=int, default=50,
+                        help='concurrent GET /api/feed requests fired while uploads are stalled')
+    parser.add_argument('--probe-timeout', type=float, default=5.0)
+    args = parser.parse_args()
+
+    print(f'{"mode":<14} {"in-flight":>9} {"answered":>9} {"p50 ms":>8} '
+          f'{"idle MB":>8} {"loaded MB":>10} {"KB/req":>8}')
+    for mode in ('gunicorn-sync', 'uvicorn-asgi'):
+        result = asyncio.run(run_mode(mode, args.workers, args.in_flight,
+                                      args.probes, args.probe_timeout))
+        p50 = f'{result["p50_ms"]:.1f}' if result['p50_ms'] is not None else '-'
+        print(f'{result["mode"]:<14} {result["in_flight"]:>9} '
+              f'{result["answered"]:>5}/{args.probes:<3} {p50:>8} '
+              f'{result["idle_rss_mb"]:>8.1f} {result["loaded_rss_mb"]:>10.1f} '
+              f'{result["kb_per_request"]:>8.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+# feed_snapshot.py - Compact read model for serving /api/feed without the ORM
+#
+# Each post is kept as a small __slots__ record holding its JSON already
+# encoded, with dates pre-formatted. Club objects are encoded once per club and
+# spliced into every post of that club at page-assembly time, so a follow only
+# re-encodes one club. Pages are built by joining these pre-encoded bytes.
+#
+# The snapshot keeps the newest posts, at most `max_posts` of them and at most
+# `max_bytes` of accounted memory (encoded JSON plus a fixed per-record
+# overhead), so one worker's footprint is bounded whatever the post sizes.
+# Pages beyond that window return None and the caller falls back to the database.
+import bisect
+import json
+from datetime import datetime, timedelta
+
+_EPOCH = datetime(1970, 1, 1)
+
+# Measured cost of one record beyond its encoded body: the slots object, sort key
+# tuple and ints, bytes header, and the dict/list entries that point at it
+RECORD_OVERHEAD = 360
+
+
+def _encode(value):
+    # Same bytes as the app's jsonify: sorted keys, compact separators, UTF-8
+    return json.dumps(value, ensure_ascii=False, sort_keys=True, separators=(',', ':')).encode('utf-8')
+
+
+def _format_datetime(value):
+    return value.strftime('%Y-%m-%d %H:%M') if value else None
+
+
+class FeedRecord:
+    __slots__ = ('post_id', 'club_id', 'sort_key', 'body')
+
+    def __init__(self, post_id, club_id, sort_key, body):
+        self.post_id = post_id
+        self.club_id = club_id
+        self.sort_key = sort_key
+        self.body = body  # Encoded post fields after "club", without braces
+
+
+class FeedSnapshot:
+    def __init__(self, max_posts, max_bytes):
+        self.max_posts = max_posts
+        self.max_bytes = max_bytes
+        self.records = {}  # post id -> FeedRecord
+        self.order = []    # sort keys, newest first
+        self.clubs = {}    # club id -> encoded club object
+        self.bytes = 0     # accounted size of all records
+        self.truncated = False  # older posts exist that are not in the snapshot
+        self.total = 0     # posts in the database, not just in the snapshot
+        self.watermark = 0  # last applied FeedChange id
+        self.loaded = False
+
+    def clear(self):
+        self.records.clear()
+        self.order.clear()
+        self.clubs.clear()
+        self.bytes = 0
+        self.truncated = False
+        self.total = 0
+        self.watermark = 0
+        self.loaded = False
+
+    def upsert_club(self, club_id, name, username, avatar, subscribers):
+        self.clubs[club_id] = _encode({
+            'id': club_id,
+            'name': name,
+            'username': username,
+            'avatar': avatar,
+            'subscribers': subscribers
+        })
+
+    def upsert_post(self, post_id, club_id, title, content, media_url, media_type,
+                    likes, views, created_at, event_type, event_date):
+        # Newest first (same order as app.feed_page): negated microseconds, then id
+        sort_key = (-((created_at - _EPOCH) // timedelta(microseconds=1)), -post_id)
+
+        existing = self.records.pop(post_id, None)
+        if existing is not None:
+            del self.order[bisect.bisect_left(self.order, existing.sort_key)]
+            self.bytes -= len(existing.body) + RECORD_OVERHEAD
+        elif self.truncated and (not self.order or sort_key > self.order[-1]):
+            return  # Older than everything kept; outside the snapshot window
+
+        # "club" sorts before every other key, so the club object is spliced in front
+        body = _encode({
+            'id': post_id,
+            'title': title,
+            'content': content,
+            'media_url': media_url,
+            'media_type': media_type,
+            'likes': likes,
+            'views': views,
+            'created_at': _format_datetime(created_at),
+            'event_type': event_type,
+            'event_date': _format_datetime(event_date)
+        })[1:-1]
+
+        self.records[post_id] = FeedRecord(post_id, club_id, sort_key, body)
+        bisect.insort(self.order, sort_key)
+        self.bytes += len(body) + RECORD_OVERHEAD
+
+        # Evict the oldest posts; this may be the one just added
+        while self.order and (len(self.order) > self.max_posts or self.bytes > self.max_bytes):
+            evicted = self.records.pop(-self.order.pop()[1])
+            self.bytes -= len(evicted.body) + RECORD_OVERHEAD
+            self.truncated = True
+
+    def page(self, page, per_page):
+        start = (max(page, 1) - 1) * per_page
+        end = start + per_page
+        if end > len(self.order) and len(self.order) < self.total:
+            return None  # Runs past the snapshot window
+
+        posts = b','.join(
+            b'{"club":' + self.clubs[record.club_id] + b',' + record.body + b'}'
+            for record in (self.records[-key[1]] for key in self.order[start:end])
+        )
+        has_next = b'true' if end < self.total else b'false'
+        return (b'{"has_next":' + has_next + b',"posts":[' + posts
+                + b'],"total":' + str(self.total).encode('ascii') + b'}\n')
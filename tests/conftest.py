@@ -0,0 +1,26 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# Point the app at a throwaway SQLite file before it is imported
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'test.db')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as campus_app  # noqa: E402
+
+
+@pytest.fixture
+def app():
+    with campus_app.app.app_context():
+        campus_app.db.drop_all()
+    campus_app.init_database()
+    campus_app.feed_snapshot.clear()
+    campus_app._card_cache.clear()
+    yield campus_app.app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
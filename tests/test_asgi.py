@@ -0,0 +1,144 @@
+import asyncio
+import json
+
+import pytest
+
+import app as campus_app
+import asgi
+from feed_snapshot import FeedSnapshot
+
+
+@pytest.fixture(scope='module')
+def loop():
+    # One loop for the module, as in a server worker; asgi's connection and lock live on it
+    loop = asyncio.new_event_loop()
+    yield loop
+    if asgi._connection is not None:
+        loop.run_until_complete(asgi._connection.close())
+        asgi._connection = None
+    loop.close()
+
+
+def call(loop, method, path, query=b'', headers=(), chunks=(b'',)):
+    messages = [{'type': 'http.request', 'body': chunk, 'more_body': i < len(chunks) - 1}
+                for i, chunk in enumerate(chunks)]
+    sent = []
+
+    async def receive():
+        return messages.pop(0) if messages else {'type': 'http.disconnect'}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        'type': 'http', 'method': method, 'path': path, 'query_string': query,
+        'headers': list(headers), 'http_version': '1.1', 'scheme': 'http',
+        'server': ('testserver', 80), 'client': ('127.0.0.1', 50000), 'root_path': '',
+    }
+    loop.run_until_complete(asgi.application(scope, receive, send))
+
+    start = sent[0]
+    body = b''.join(message.get('body', b'') for message in sent[1:])
+    return start['status'], {name.lower(): value for name, value in start['headers']}, body, messages
+
+
+def test_feed_is_byte_identical_across_serving_paths(client, loop, monkeypatch):
+    # The snapshot (WSGI and ASGI) and the ORM fallback must agree byte for byte
+    for page in (0, 1, 2, 3):
+        status, headers, asgi_body, _ = call(loop, 'GET', '/api/feed', f'page={page}'.encode())
+        snapshot_body = client.get(f'/api/feed?page={page}').data
+        with monkeypatch.context() as patch:
+            patch.setattr(campus_app, 'feed_snapshot_page', lambda page: None)
+            database_body = client.get(f'/api/feed?page={page}').data
+
+        assert status == 200
+        assert headers[b'content-type'] == b'application/json'
+        assert asgi_body == snapshot_body == database_body
+
+
+def test_feed_past_snapshot_window_falls_through_to_flask(client, loop, monkeypatch):
+    window = FeedSnapshot(campus_app.FEED_PER_PAGE, campus_app.FEED_SNAPSHOT_MAX_BYTES)
+    monkeypatch.setattr(campus_app, 'feed_snapshot', window)
+
+    status, _, body, _ = call(loop, 'GET', '/api/feed', b'page=2')
+
+    assert window.truncated and window.page(2, campus_app.FEED_PER_PAGE) is None
+    assert status == 200
+    assert body == client.get('/api/feed?page=2').data
+    assert json.loads(body)['has_next'] is False
+
+
+def test_clubs_match_flask_bytes(client, loop):
+    status, headers, body, _ = call(loop, 'GET', '/api/clubs')
+
+    assert status == 200
+    assert headers[b'content-type'] == b'application/json'
+    assert body == client.get('/api/clubs').data
+
+
+def test_other_routes_fall_through_to_flask(client, loop):
+    payload = json.dumps({'user_id': 'asgi', 'operations': [
+        {'op_id': 'a', 'type': 'like', 'post_id': 1},
+    ]}).encode()
+    status, _, body, _ = call(loop, 'POST', '/api/batch',
+                              headers=[(b'content-type', b'application/json'),
+                                       (b'content-length', str(len(payload)).encode())],
+                              chunks=(payload[:10], payload[10:]))
+
+    assert status == 200
+    assert json.loads(body)['results'][0]['likes'] == 343
+
+    status, headers, body, _ = call(loop, 'GET', '/api/feed/fragment', b'page=1')
+    expected = client.get('/api/feed/fragment?page=1')
+    assert status == 200
+    assert headers[b'x-has-next'] == b'true'
+    assert body == expected.data
+
+
+def test_streamed_index_through_thread_pool(client, loop):
+    status, headers, body, _ = call(loop, 'GET', '/')
+
+    assert status == 200
+    assert headers[b'content-type'].startswith(b'text/html')
+    assert body == client.get('/').data
+
+
+def test_declared_oversized_body_is_rejected_unread(client, loop, monkeypatch):
+    monkeypatch.setitem(campus_app.app.config, 'MAX_CONTENT_LENGTH', 100)
+    status, _, _, unread = call(loop, 'POST', '/api/upload',
+                                headers=[(b'content-length', b'1000')], chunks=(b'x' * 1000,))
+
+    assert status == 413
+    assert len(unread) == 1
+
+
+def test_chunked_oversized_body_is_rejected(client, loop, monkeypatch):
+    monkeypatch.setitem(campus_app.app.config, 'MAX_CONTENT_LENGTH', 100)
+    status, _, _, unread = call(loop, 'POST', '/api/upload',
+                                chunks=(b'x' * 60, b'x' * 60, b'x' * 60))
+
+    assert status == 413
+    assert len(unread) == 1  # Stopped reading at the cap
+
+
+def test_concurrent_first_requests_share_one_connection(client, loop, monkeypatch):
+    if asgi._connection is not None:
+        loop.run_until_complete(asgi._connection.close())
+        asgi._connection = None
+
+    connect = asgi.aiosqlite.connect
+    opened = []
+
+    def counting_connect(*args, **kwargs):
+        opened.append(args)
+        return connect(*args, **kwargs)
+
+    monkeypatch.setattr(asgi.aiosqlite, 'connect', counting_connect)
+
+    async def first_requests():
+        return await asyncio.gather(asgi._get_connection(), asgi._get_connection())
+
+    first, second = loop.run_until_complete(first_requests())
+
+    assert first is second
+    assert len(opened) == 1
@@ -0,0 +1,115 @@
+import threading
+
+import app as campus_app
+
+
+def post_batch(client, operations, user_id='tester'):
+    return client.post('/api/batch', json={'user_id': user_id, 'operations': operations})
+
+
+def test_batch_applies_ops_in_order(client):
+    response = post_batch(client, [
+        {'op_id': 'a', 'type': 'like', 'post_id': 1},
+        {'op_id': 'b', 'type': 'unlike', 'post_id': 1},
+        {'op_id': 'c', 'type': 'subscribe', 'club_id': 2},
+        {'op_id': 'd', 'type': 'view', 'post_id': 3},
+    ])
+
+    assert response.status_code == 200
+    results = response.get_json()['results']
+    assert [r['op_id'] for r in results] == ['a', 'b', 'c', 'd']
+    assert results[0]['liked'] is True and results[0]['likes'] == 343
+    assert results[1]['liked'] is False and results[1]['likes'] == 342
+    assert results[2]['subscribed'] is True and results[2]['subscribers'] == 3457
+    assert results[3]['views'] == 2101
+
+
+def test_replayed_op_returns_original_result(client):
+    first = post_batch(client, [{'op_id': 'like-1', 'type': 'like', 'post_id': 1}]).get_json()
+    again = post_batch(client, [{'op_id': 'like-1', 'type': 'like', 'post_id': 1}]).get_json()
+
+    assert 'replayed' not in first['results'][0]
+    assert again['results'][0]['replayed'] is True
+    assert again['results'][0]['likes'] == first['results'][0]['likes']
+    with campus_app.app.app_context():
+        assert campus_app.db.session.get(campus_app.Post, 1).likes == 343
+
+
+def test_duplicate_op_id_within_one_batch_applies_once(client):
+    results = post_batch(client, [
+        {'op_id': 'dup', 'type': 'like', 'post_id': 1},
+        {'op_id': 'dup', 'type': 'unlike', 'post_id': 1},
+    ]).get_json()['results']
+
+    assert results[1]['replayed'] is True
+    assert results[1]['liked'] is True
+
+
+def test_concurrent_replays_all_succeed(app):
+    statuses, replayed = [], []
+
+    def send():
+        response = post_batch(app.test_client(), [{'op_id': 'same-race', 'type': 'like', 'post_id': 1}])
+        statuses.append(response.status_code)
+        replayed.append(response.get_json()['results'][0].get('replayed', False))
+
+    threads = [threading.Thread(target=send) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert statuses == [200] * 4
+    assert sorted(replayed) == [False, True, True, True]
+    with app.app_context():
+        assert campus_app.db.session.get(campus_app.Post, 1).likes == 343
+
+
+def test_malformed_op_fails_alone(client):
+    response = post_batch(client, [
+        {'op_id': 'bad-1', 'type': 'like', 'post_id': [1]},
+        {'op_id': 'bad-2', 'type': 'subscribe', 'club_id': '1'},
+        {'op_id': 'bad-3', 'type': 'teleport'},
+        {'op_id': 'bad-4', 'type': 'view', 'post_id': 10 ** 30},
+        {'op_id': 'good', 'type': 'like', 'post_id': 1},
+    ])
+
+    assert response.status_code == 200
+    results = response.get_json()['results']
+    assert [r['success'] for r in results] == [False, False, False, False, True]
+
+
+def test_rejects_malformed_batches(client):
+    assert client.post('/api/batch', json=[{'op_id': 'a', 'type': 'like', 'post_id': 1}]).status_code == 400
+    assert client.post('/api/batch', data='not json', content_type='application/json').status_code == 400
+    assert post_batch(client, {'op_id': 'x'}).status_code == 400
+    assert post_batch(client, [{'op_id': 1, 'type': 'like', 'post_id': 1}]).status_code == 400
+    assert post_batch(client, [{'op_id': True, 'type': 'like', 'post_id': 1}]).status_code == 400
+    assert post_batch(client, [{'type': 'like', 'post_id': 1}]).status_code == 400
+    assert post_batch(client, [{'op_id': 'x' * 101, 'type': 'like', 'post_id': 1}]).status_code == 400
+    too_many = [{'op_id': str(i), 'type': 'view', 'post_id': 1} for i in range(101)]
+    assert post_batch(client, too_many).status_code == 400
+
+
+def test_old_applied_operations_are_pruned(client):
+    post_batch(client, [{'op_id': 'old', 'type': 'like', 'post_id': 1}])
+    with campus_app.app.app_context():
+        campus_app.AppliedOperation.query.update(
+            {'created_at': campus_app.datetime.utcnow() - campus_app.APPLIED_OPERATION_RETENTION * 2}
+        )
+        campus_app.db.session.commit()
+
+    post_batch(client, [{'op_id': 'new', 'type': 'view', 'post_id': 1}])
+
+    with campus_app.app.app_context():
+        assert [op.op_id for op in campus_app.AppliedOperation.query.all()] == ['new']
+
+
+def test_toggle_routes_flip_state(client):
+    first = client.post('/api/like/1', json={'user_id': 'tester'}).get_json()
+    second = client.post('/api/like/1', json={'user_id': 'tester'}).get_json()
+    assert (first['liked'], first['likes']) == (True, 343)
+    assert (second['liked'], second['likes']) == (False, 342)
+
+    followed = client.post('/api/subscribe/2', json={'user_id': 'tester'}).get_json()
+    assert followed['subscribed'] is True and followed['subscribers'] == 3457
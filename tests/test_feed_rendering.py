@@ -0,0 +1,73 @@
+import re
+
+import app as campus_app
+
+
+def card_ids(html):
+    return [int(post_id) for post_id in re.findall(r'class="post-card" data-post-id="(\d+)"', html)]
+
+
+def action_counts(html):
+    return re.findall(r'<span class="action-count">(\d+)</span>', html)
+
+
+def newest_posts(limit):
+    return campus_app.Post.query.order_by(
+        campus_app.Post.created_at.desc(), campus_app.Post.id.desc()
+    ).limit(limit).all()
+
+
+def test_fragment_pages_and_has_next(client):
+    first = client.get('/api/feed/fragment?page=1')
+    second = client.get('/api/feed/fragment?page=2')
+    past_end = client.get('/api/feed/fragment?page=3')
+
+    assert first.headers['Content-Type'] == 'text/html; charset=utf-8'
+    assert first.headers['X-Has-Next'] == 'true'
+    assert second.headers['X-Has-Next'] == 'false'
+    assert past_end.headers['X-Has-Next'] == 'false' and past_end.data == b''
+
+    ids = card_ids(first.get_data(as_text=True)) + card_ids(second.get_data(as_text=True))
+    with campus_app.app.app_context():
+        assert ids == [post.id for post in newest_posts(None)]
+    assert len(card_ids(first.get_data(as_text=True))) == campus_app.FEED_PER_PAGE
+
+
+def test_index_streams_first_page_inline(client):
+    response = client.get('/')
+    assert response.is_streamed
+
+    html = response.get_data(as_text=True)
+    fragment = client.get('/api/feed/fragment?page=1').get_data(as_text=True)
+    assert card_ids(html) == card_ids(fragment)
+    assert 'data-has-next="true"' in html
+
+
+def test_card_cache_reuses_html_until_signature_changes(app):
+    with app.test_request_context():
+        post = campus_app.db.session.get(campus_app.Post, 1)
+        first = campus_app.render_post_card(post)
+
+        post.views += 10  # Not rendered on the card
+        assert campus_app.render_post_card(post) is first
+
+        post.likes += 1
+        liked = campus_app.render_post_card(post)
+        assert liked is not first
+        # Placeholder comment/share counts stay put across re-renders
+        assert action_counts(liked)[1:] == action_counts(first)[1:]
+        assert action_counts(liked)[0] == str(post.likes)
+
+        post.title = 'Renamed'
+        assert campus_app.render_post_card(post) is not liked
+        campus_app.db.session.rollback()
+
+
+def test_card_cache_evicts_oldest_entry(app, monkeypatch):
+    monkeypatch.setattr(campus_app, 'CARD_CACHE_SIZE', 3)
+    with app.test_request_context():
+        posts = newest_posts(5)
+        for post in posts:
+            campus_app.render_post_card(post)
+
+    assert list(campus_app._card_cache) == [post.id for post in posts[2:]]
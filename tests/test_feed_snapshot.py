@@ -0,0 +1,111 @@
+from datetime import datetime
+
+import app as campus_app
+from feed_snapshot import FeedSnapshot, RECORD_OVERHEAD
+
+
+def feed_bytes(client, page=1):
+    response = client.get(f'/api/feed?page={page}')
+    assert response.status_code == 200
+    return response.data
+
+
+def database_feed_bytes(client, monkeypatch, page=1):
+    with monkeypatch.context() as patch:
+        patch.setattr(campus_app, 'feed_snapshot_page', lambda page: None)
+        return feed_bytes(client, page)
+
+
+def test_snapshot_matches_database_response(client, monkeypatch):
+    for page in (1, 2, 3):
+        assert feed_bytes(client, page) == database_feed_bytes(client, monkeypatch, page)
+    assert campus_app.feed_snapshot.loaded
+
+
+def test_write_from_another_session_refreshes_incrementally(client, monkeypatch):
+    feed_bytes(client)
+    snapshot = campus_app.feed_snapshot
+    newest, untouched = (snapshot.records[-key[1]] for key in snapshot.order[:2])
+    watermark = snapshot.watermark
+
+    with campus_app.app.app_context():
+        campus_app.db.session.get(campus_app.Post, newest.post_id).likes = 999
+        campus_app.db.session.get(campus_app.Club, 3).subscribers = 7
+        campus_app.db.session.commit()
+
+    assert b'"likes":999' in feed_bytes(client)
+    assert b'"subscribers":7' in feed_bytes(client)
+    assert snapshot.records[untouched.post_id] is untouched
+    assert snapshot.watermark == watermark + 2
+    assert feed_bytes(client) == database_feed_bytes(client, monkeypatch)
+
+
+def test_new_post_from_route_appears_in_snapshot(client, monkeypatch):
+    feed_bytes(client)
+    total = campus_app.feed_snapshot.total
+
+    post_id = client.post('/api/post', json={'club_id': 2, 'content': '新活動'}).get_json()['post_id']
+
+    assert campus_app.feed_snapshot.total == total  # Not refreshed until the next read
+    assert f'"id":{post_id},'.encode() in feed_bytes(client)
+    assert campus_app.feed_snapshot.total == total + 1
+    assert feed_bytes(client, 2) == database_feed_bytes(client, monkeypatch, 2)
+
+
+def test_change_log_pruned_past_watermark_rebuilds(client, monkeypatch):
+    feed_bytes(client)
+    snapshot = campus_app.feed_snapshot
+    newest, untouched = (snapshot.records[-key[1]] for key in snapshot.order[:2])
+
+    monkeypatch.setattr(campus_app, 'FEED_CHANGE_RETENTION', 1)
+    for likes in (500, 501, 502):
+        with campus_app.app.app_context():
+            campus_app.db.session.get(campus_app.Post, newest.post_id).likes = likes
+            campus_app.db.session.commit()
+
+    assert b'"likes":502' in feed_bytes(client)
+    assert snapshot.records[untouched.post_id] is not untouched
+    assert feed_bytes(client) == database_feed_bytes(client, monkeypatch)
+
+
+def test_byte_budget_evicts_oldest_and_falls_back(client, monkeypatch):
+    feed_bytes(client)
+    full = campus_app.feed_snapshot
+    kept = [full.records[-key[1]] for key in full.order[:campus_app.FEED_PER_PAGE]]
+    budget = sum(len(record.body) + RECORD_OVERHEAD for record in kept)
+
+    snapshot = FeedSnapshot(campus_app.FEED_SNAPSHOT_MAX_POSTS, budget)
+    monkeypatch.setattr(campus_app, 'feed_snapshot', snapshot)
+
+    first = feed_bytes(client)
+    assert snapshot.truncated and len(snapshot.records) == campus_app.FEED_PER_PAGE
+    assert snapshot.bytes <= budget
+    assert first == database_feed_bytes(client, monkeypatch)
+    assert snapshot.page(2, campus_app.FEED_PER_PAGE) is None
+    assert feed_bytes(client, 2) == database_feed_bytes(client, monkeypatch, 2)
+
+    # Edits to posts outside the window do not pull them back in
+    oldest = -full.order[-1][1]
+    with campus_app.app.app_context():
+        campus_app.db.session.get(campus_app.Post, oldest).likes = 12345
+        campus_app.db.session.commit()
+    feed_bytes(client)
+    assert oldest not in snapshot.records
+    assert snapshot.bytes <= budget
+
+
+def test_old_post_outside_truncated_window_is_not_inserted():
+    snapshot = FeedSnapshot(max_posts=2, max_bytes=1 << 20)
+    snapshot.upsert_club(1, 'Club', '@club', None, 0)
+    for post_id, day in ((1, 1), (2, 2), (3, 3)):
+        snapshot.upsert_post(post_id, 1, None, 'text', None, None, 0, 0, datetime(2025, 9, day), None, None)
+
+    assert snapshot.truncated
+    assert sorted(snapshot.records) == [2, 3]
+
+    snapshot.upsert_post(9, 1, None, 'late', None, None, 0, 0, datetime(2025, 8, 1), None, None)
+    assert 9 not in snapshot.records
+
+    snapshot.upsert_post(10, 1, None, 'new', None, None, 0, 0, datetime(2025, 9, 4), None, None)
+    assert sorted(snapshot.records) == [3, 10]
+    assert snapshot.bytes == sum(len(record.body) + RECORD_OVERHEAD for record in snapshot.records.values())
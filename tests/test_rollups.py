@@ -0,0 +1,71 @@
+from datetime import datetime, timedelta
+
+import app as campus_app
+
+
+def rollups(model, granularity):
+    with campus_app.app.app_context():
+        return model.query.filter_by(granularity=granularity).all()
+
+
+def test_writes_upsert_hourly_and_daily_buckets(client):
+    client.post('/api/like/1', json={'user_id': 'a'})
+    client.post('/api/like/1', json={'user_id': 'b'})
+    client.post('/api/like/1', json={'user_id': 'a'})  # Toggles back off
+    client.post('/api/subscribe/1', json={'user_id': 'a'})
+
+    for granularity in ('hour', 'day'):
+        (post_row,) = rollups(campus_app.PostEngagementRollup, granularity)
+        assert (post_row.post_id, post_row.likes, post_row.unlikes) == (1, 2, 1)
+
+        (club_row,) = rollups(campus_app.ClubEngagementRollup, granularity)
+        assert (club_row.club_id, club_row.likes, club_row.unlikes, club_row.new_subscribers) == (1, 2, 1, 1)
+
+
+def test_stats_endpoint_reads_rollups(client):
+    client.post('/api/like/1', json={'user_id': 'a'})
+    client.post('/api/batch', json={'user_id': 'a', 'operations': [
+        {'op_id': 'v1', 'type': 'view', 'post_id': 1},
+        {'op_id': 'v2', 'type': 'view', 'post_id': 6},
+    ]})
+
+    data = client.get('/api/clubs/1/stats').get_json()
+
+    assert data['granularity'] == 'day'
+    assert data['totals']['likes'] == 1
+    assert data['totals']['views'] == 2
+    assert {p['post_id']: p['views'] for p in data['posts']} == {1: 1, 6: 1}
+
+
+def test_stats_accepts_timezone_aware_bounds(client):
+    client.post('/api/like/1', json={'user_id': 'a'})
+    now = datetime.utcnow()
+    start = (now + timedelta(hours=8) - timedelta(hours=1)).strftime('%Y-%m-%dT%H:%M+08:00')
+
+    response = client.get('/api/clubs/1/stats', query_string={'start': start})
+
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['start'] == (now - timedelta(hours=1)).strftime('%Y-%m-%d %H:%M')
+    assert data['totals']['likes'] == 1
+
+
+def test_stats_rejects_bad_ranges(client):
+    assert client.get('/api/clubs/1/stats?start=2025-02-01&end=2025-01-01').status_code == 400
+    assert client.get('/api/clubs/1/stats?start=yesterday').status_code == 400
+    assert client.get('/api/clubs/1/stats?granularity=week').status_code == 400
+    assert client.get('/api/clubs/1/stats?start=2020-01-01&granularity=hour').status_code == 400
+    assert client.get('/api/clubs/99/stats').status_code == 404
+
+
+def test_compaction_drops_old_hourly_buckets_only(app):
+    old = datetime.utcnow() - campus_app.ROLLUP_HOURLY_RETENTION - timedelta(days=1)
+    with app.app_context():
+        for granularity, bucket in campus_app.rollup_buckets(old).items():
+            campus_app.db.session.add(campus_app.ClubEngagementRollup(
+                club_id=1, granularity=granularity, bucket=bucket, likes=5))
+        campus_app.compact_rollups()
+        campus_app.db.session.commit()
+
+        remaining = campus_app.ClubEngagementRollup.query.all()
+        assert [row.granularity for row in remaining] == ['day']